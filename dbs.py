@@ -1,11 +1,32 @@
 import datetime
 from dataclasses import dataclass
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
 import pandas as pd
 
-from dto import AssetGroup, CreateTransferTransactionRequest
+from dto import Asset, AssetGroup, CreateTransferTransactionRequest
 from finance_manager import FinanceManager
+from journal import SubmissionJournal
+from transaction_store import TransactionStore, as_datetime
+
+
+def find_transfer_assets(asset_groups: List[AssetGroup]) -> Tuple[Asset, Asset] | None:
+    asset_group = next(
+        (group for group in asset_groups if group.id == '1'), None)
+    if asset_group is None:
+        return
+
+    from_asset = next((asset for asset in asset_group.children if asset.id ==
+                       '17ecb0ea-09b1-4251-aae0-c2706755f22d'), None)
+    if from_asset is None:
+        return
+
+    to_asset = next((asset for asset in asset_group.children if asset.id ==
+                     '05c64c05-8fa5-4b8d-a33c-0ab1a662fc65'), None)
+    if to_asset is None:
+        return
+
+    return from_asset, to_asset
 
 
 @dataclass
@@ -21,21 +42,11 @@ class Transaction:
     misc_info: str
 
     def to_request(self, asset_groups: List[AssetGroup]) -> CreateTransferTransactionRequest | None:
-        asset_group = next(
-            (group for group in asset_groups if group.id == '1'), None)
-        if asset_group is None:
-            return
-
-        from_asset = next((asset for asset in asset_group.children if asset.id ==
-                           '17ecb0ea-09b1-4251-aae0-c2706755f22d'), None)
-        if from_asset is None:
-            return
-
-        to_asset = next((asset for asset in asset_group.children if asset.id ==
-                         '05c64c05-8fa5-4b8d-a33c-0ab1a662fc65'), None)
-        if to_asset is None:
+        assets = find_transfer_assets(asset_groups)
+        if assets is None:
             return
 
+        from_asset, to_asset = assets
         request = CreateTransferTransactionRequest(
             from_asset,
             to_asset,
@@ -74,6 +85,14 @@ class DBS:
 
         return df
 
+    @staticmethod
+    def to_store(transactions: List['Transaction']) -> TransactionStore['Transaction']:
+        return TransactionStore(
+            transactions,
+            timestamp=lambda transaction: as_datetime(transaction.date),
+            texts=lambda transaction: (transaction.reference, transaction.additional_info, transaction.misc_info),
+        )
+
 
 if __name__ == '__main__':
     dbs_df = DBS.parse_transaction_history_csv('/home/ajohanes/Downloads/b8fd0fffea50be10f53ff12d06f4026d.P000000077958701.csv')
@@ -86,10 +105,12 @@ if __name__ == '__main__':
     m.load_asset_data()
     m.load_init_data()
 
-    for transaction in transactions[::-1]:
-        request = transaction.to_request(m.asset_groups)
-        print(request.to_dict())
+    with SubmissionJournal('./dbs_journal.jsonl') as journal:
+        for transaction in transactions[::-1]:
+            request = transaction.to_request(m.asset_groups)
+            payload = request.to_dict() if request is not None else None
+            print(payload)
 
-        m.create_transfer_transaction(request)
+            journal.submit(payload, m.post_transfer_transaction)
 
     print("done")
@@ -0,0 +1,130 @@
+from dataclasses import fields
+from typing import List
+from urllib.parse import quote_plus
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+from dbs import Transaction, find_transfer_assets
+from dto import Asset
+from finance_manager import FinanceManager
+from journal import SubmissionJournal
+
+
+class DBSArrow:
+    """Columnar variant of the DBS import that encodes request bodies straight from Arrow columns"""
+
+    column_names = [field.name for field in fields(Transaction)]
+
+    @staticmethod
+    def read_transaction_history_csv(path: str) -> pa.Table:
+        table = pa_csv.read_csv(
+            path,
+            read_options=pa_csv.ReadOptions(skip_rows=19, use_threads=True),
+            convert_options=pa_csv.ConvertOptions(strings_can_be_null=False),
+        )
+
+        # the export ends every row with a trailing comma, which shows up as an extra unnamed column
+        table = table.select(range(len(DBSArrow.column_names)))
+        return table.rename_columns(DBSArrow.column_names)
+
+    @staticmethod
+    def filter_transfers(table: pa.Table) -> pa.Table:
+        statement_code = DBSArrow._string_column(table, 'statement_code')
+        reference_code = DBSArrow._string_column(table, 'reference_code')
+
+        mask = pc.or_(
+            pc.and_(pc.equal(statement_code, 'POS'), pc.equal(reference_code, 'BAT')),
+            pc.and_(pc.equal(statement_code, 'GR'), pc.equal(reference_code, 'IBG')),
+        )
+        return table.filter(mask)
+
+    @staticmethod
+    def encode_transfer_requests(table: pa.Table, from_asset: Asset, to_asset: Asset,
+                                 date_format: str = '%d %b %Y') -> List[bytes]:
+        """Build the same form body as `CreateTransferTransactionRequest.to_dict` for every row"""
+        debit = DBSArrow._amount_column(table, 'debit')
+        credit = DBSArrow._amount_column(table, 'credit')
+        money = pc.if_else(pc.not_equal(debit, 0), debit, pc.negate(credit))
+
+        additional_info = DBSArrow._string_column(table, 'additional_info')
+        misc_info = DBSArrow._string_column(table, 'misc_info')
+        description = pc.if_else(
+            pc.equal(misc_info, ''),
+            additional_info,
+            pc.binary_join_element_wise(additional_info, misc_info, ' '),
+        )
+
+        body = pc.binary_join_element_wise(
+            'moveDate=', DBSArrow._date_column(table, 'date', date_format),
+            f'&toAssetId={quote_plus(to_asset.id)}',
+            f'&fromAssetId={quote_plus(from_asset.id)}',
+            '&moveMoney=', DBSArrow._float_column(money),
+            '&moneyContent=', DBSArrow._quote_column(DBSArrow._string_column(table, 'reference')),
+            '&mbDetailContent=', DBSArrow._quote_column(description),
+            '',
+        )
+
+        return pc.cast(body, pa.binary()).to_pylist()
+
+    @staticmethod
+    def _string_column(table: pa.Table, name: str) -> pa.ChunkedArray:
+        column = table.column(name)
+        if not pa.types.is_string(column.type):
+            column = pc.cast(column, pa.string())
+
+        return pc.fill_null(column, '')
+
+    @staticmethod
+    def _amount_column(table: pa.Table, name: str) -> pa.ChunkedArray:
+        column = table.column(name)
+        if pa.types.is_floating(column.type) or pa.types.is_integer(column.type):
+            return pc.fill_null(pc.cast(column, pa.float64()), 0)
+
+        # blank amounts come through as empty or whitespace-only strings
+        column = pc.utf8_trim_whitespace(DBSArrow._string_column(table, name))
+        column = pc.if_else(pc.equal(column, ''), '0', column)
+        return pc.cast(column, pa.float64())
+
+    @staticmethod
+    def _float_column(column: pa.ChunkedArray) -> pa.ChunkedArray:
+        text = pc.cast(column, pa.string())
+        # arrow writes whole numbers as '2' where python's str gives '2.0'
+        return pc.if_else(pc.equal(column, pc.floor(column)), pc.binary_join_element_wise(text, '.0', ''), text)
+
+    @staticmethod
+    def _date_column(table: pa.Table, name: str, date_format: str) -> pa.ChunkedArray:
+        column = table.column(name)
+        if not pa.types.is_timestamp(column.type):
+            column = pc.strptime(pc.utf8_trim_whitespace(column), format=date_format, unit='s')
+
+        return pc.strftime(column, format='%Y-%m-%d')
+
+    @staticmethod
+    def _quote_column(column: pa.ChunkedArray) -> pa.ChunkedArray:
+        # arrow has no url-encoding kernel, so only quote the distinct values and gather them back
+        encoded = pc.dictionary_encode(column).combine_chunks()
+        quoted = pa.array([quote_plus(value) for value in encoded.dictionary.to_pylist()], pa.string())
+        return pc.take(quoted, encoded.indices)
+
+
+if __name__ == '__main__':
+    dbs_table = DBSArrow.read_transaction_history_csv('/home/ajohanes/Downloads/b8fd0fffea50be10f53ff12d06f4026d.P000000077958701.csv')
+    filtered_table = DBSArrow.filter_transfers(dbs_table)
+
+    m = FinanceManager("192.168.0.193:8888")
+    m.load_asset_data()
+    m.load_init_data()
+
+    from_asset, to_asset = find_transfer_assets(m.asset_groups)
+    bodies = DBSArrow.encode_transfer_requests(filtered_table, from_asset, to_asset)
+
+    # bodies are keyed as bytes here, so this can't share the pandas path's journal
+    with SubmissionJournal('./dbs_arrow_journal.jsonl') as journal:
+        for body in bodies[::-1]:
+            print(body)
+
+            journal.submit(body, m.post_transfer_transaction)
+
+    print("done")
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import datetime
 from enum import Enum
 
@@ -84,6 +84,21 @@ class AssetGroup:
         }
 
 
+@dataclass(frozen=True)
+class Catalog:
+    """Categories and assets loaded from MoneyBook, replaced as a whole and never changed in place"""
+    income_categories: Tuple[Category, ...] = ()
+    expense_categories: Tuple[Category, ...] = ()
+    asset_groups: Tuple[AssetGroup, ...] = ()
+
+    @property
+    def categories(self) -> Dict[InOutCode, Tuple[Category, ...]]:
+        return {
+            InOutCode.Expenses: self.expense_categories,
+            InOutCode.Income: self.income_categories,
+        }
+
+
 @dataclass
 class CreateInOutTransactionRequest:
     in_out_code: InOutCode
@@ -1,6 +1,8 @@
+import dataclasses
 import json
+import threading
 
-from typing import List
+from typing import List, Dict, Any, Tuple
 
 import cson
 import requests
@@ -8,26 +10,58 @@ from dto import *
 
 
 class FinanceManager:
+    """Client for the MoneyBook server, holding its catalog as a lock-free readable snapshot"""
+
+    request_timeout = 10
+
     def __init__(self, url: str):
         self.base_url = url
-        self.income_categories: List['Category'] = []
-        self.expense_categories: List['Category'] = []
-        self.asset_groups: List['AssetGroup'] = []
+        # readers just load this attribute, a new snapshot is published with one assignment
+        self.catalog = Catalog()
 
-    def get_remote_init_data(self):
+        # only writers lock, so two loads can't drop each other's update
+        self._publish_lock = threading.Lock()
+        self._refresh_stop = threading.Event()
+        self._refresh_thread: threading.Thread | None = None
+
+    @property
+    def income_categories(self) -> Tuple['Category', ...]:
+        return self.catalog.income_categories
+
+    @property
+    def expense_categories(self) -> Tuple['Category', ...]:
+        return self.catalog.expense_categories
+
+    @property
+    def asset_groups(self) -> Tuple['AssetGroup', ...]:
+        return self.catalog.asset_groups
+
+    def fetch_remote_init_data(self) -> Dict[str, Any]:
         url = f"http://{self.base_url}/moneyBook/getInitData"
 
-        response = requests.get(url)
-        data = cson.loads(response.content)
+        response = requests.get(url, timeout=self.request_timeout)
+        if not response.ok:
+            raise ValueError(f"getInitData failed with HTTP {response.status_code}")
+
+        return cson.loads(response.content)
+
+    def fetch_remote_asset_data(self) -> List[Dict[str, Any]]:
+        url = f"http://{self.base_url}/moneyBook/getAssetData"
+
+        response = requests.get(url, timeout=self.request_timeout)
+        if not response.ok:
+            raise ValueError(f"getAssetData failed with HTTP {response.status_code}")
+
+        return cson.loads(response.content)
+
+    def get_remote_init_data(self):
+        data = self.fetch_remote_init_data()
 
         with open("./remote_all_data.json", "w") as f:
             json.dump(data, f, indent=4)
 
     def get_remote_asset_data(self):
-        url = f"http://{self.base_url}/moneyBook/getAssetData"
-
-        response = requests.get(url)
-        data = cson.loads(response.content)
+        data = self.fetch_remote_asset_data()
 
         with open("./remote_asset_data.json", "w") as f:
             json.dump(data, f, indent=4)
@@ -36,14 +70,10 @@ class FinanceManager:
         with open("./remote_all_data.json") as f:
             data = json.load(f)
 
-        for cat in data['category_0']:
-            self.income_categories.append(Category.from_money_book(cat, InOutCode.Income))
-
-        for cat in data['category_1']:
-            self.expense_categories.append(Category.from_money_book(cat, InOutCode.Expenses))
+        catalog = self._publish(**self._parse_init_data(data))
 
-        income_category = [c.to_dict() for c in self.income_categories]
-        expense_category = [c.to_dict() for c in self.expense_categories]
+        income_category = [c.to_dict() for c in catalog.income_categories]
+        expense_category = [c.to_dict() for c in catalog.expense_categories]
 
         with open("./init_data.json", "w") as f:
             json.dump({"income_category": income_category, "expense_category": expense_category}, f, indent=4)
@@ -52,25 +82,105 @@ class FinanceManager:
         with open("./remote_asset_data.json") as f:
             data = json.load(f)
 
-        for asset_group in data:
-            self.asset_groups.append(AssetGroup.from_money_book(asset_group))
+        catalog = self._publish(**self._parse_asset_data(data))
 
-        asset_group = [a.to_dict() for a in self.asset_groups]
+        asset_group = [a.to_dict() for a in catalog.asset_groups]
 
         with open("./asset_data.json", "w") as f:
             json.dump(asset_group, f, indent=4)
 
-    def create_in_out_transaction(self, request: CreateInOutTransactionRequest):
+    def refresh(self) -> Catalog:
+        """Fetch both catalogs from the server and publish them as one snapshot"""
+        changes = self._parse_init_data(self.fetch_remote_init_data())
+        changes.update(self._parse_asset_data(self.fetch_remote_asset_data()))
+        return self._publish(**changes)
+
+    def start_refresh(self, interval: float = 300):
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+
+        # every thread gets its own stop event, so a thread that outlived stop_refresh still exits
+        self._refresh_stop = threading.Event()
+        self._refresh_thread = threading.Thread(target=self._refresh_loop, args=(interval, self._refresh_stop),
+                                                daemon=True)
+        self._refresh_thread.start()
+
+    def stop_refresh(self):
+        self._refresh_stop.set()
+
+        if self._refresh_thread is not None:
+            # a refresh in flight does two requests, each bounded by request_timeout
+            self._refresh_thread.join(timeout=2 * self.request_timeout)
+            self._refresh_thread = None
+
+    def _refresh_loop(self, interval: float, stop: threading.Event):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                # keep serving the last good snapshot until the next attempt
+                print(f"Error occurred while refreshing catalog: {str(e)}")
+
+            if stop.wait(interval):
+                return
+
+    def _publish(self, **changes) -> Catalog:
+        with self._publish_lock:
+            catalog = dataclasses.replace(self.catalog, **changes)
+            self.catalog = catalog
+
+        return catalog
+
+    @staticmethod
+    def _parse_init_data(data: Dict[str, Any]) -> Dict[str, Tuple[Category, ...]]:
+        return {
+            "income_categories": tuple(FinanceManager._freeze_category(Category.from_money_book(cat, InOutCode.Income))
+                                       for cat in data['category_0']),
+            "expense_categories": tuple(FinanceManager._freeze_category(Category.from_money_book(cat, InOutCode.Expenses))
+                                        for cat in data['category_1']),
+        }
+
+    @staticmethod
+    def _parse_asset_data(data: List[Dict[str, Any]]) -> Dict[str, Tuple[AssetGroup, ...]]:
+        asset_groups = (AssetGroup.from_money_book(asset_group) for asset_group in data)
+        return {
+            "asset_groups": tuple(dataclasses.replace(asset_group, children=tuple(asset_group.children))
+                                  for asset_group in asset_groups),
+        }
+
+    @staticmethod
+    def _freeze_category(category: Category) -> Category:
+        # readers share the snapshot, so nested lists become tuples as well
+        if category.sub_category is None:
+            return category
+
+        sub_category = tuple(FinanceManager._freeze_category(cat) for cat in category.sub_category)
+        return dataclasses.replace(category, sub_category=sub_category)
+
+    def create_in_out_transaction(self, request: CreateInOutTransactionRequest) -> requests.Response:
+        return self.post_in_out_transaction(request.to_dict())
+
+    def post_in_out_transaction(self, data: Dict[str, Any]) -> requests.Response:
         url = f"http://{self.base_url}/moneyBook/create"
 
-        resp = requests.post(url, data=request.to_dict())
+        resp = requests.post(url, data=data)
         print(resp)
+        return resp
 
-    def create_transfer_transaction(self, request: CreateTransferTransactionRequest):
+    def create_transfer_transaction(self, request: CreateTransferTransactionRequest) -> requests.Response:
+        return self.post_transfer_transaction(request.to_dict())
+
+    def post_transfer_transaction(self, data: Dict[str, Any] | bytes) -> requests.Response:
+        """Post a transfer either as a request dict or as an already form-encoded body"""
         url = f"http://{self.base_url}/moneyBook/moveAsset"
 
-        resp = requests.post(url, data=request.to_dict())
+        headers = None
+        if isinstance(data, bytes):
+            headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+        resp = requests.post(url, data=data, headers=headers)
         print(resp)
+        return resp
 
 
 if __name__ == '__main__':
@@ -0,0 +1,288 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import requests
+
+Payload = Dict[str, Any] | bytes | None
+
+
+class EntryState(Enum):
+    PENDING = 'pending'
+    SENT = 'sent'
+    ACKNOWLEDGED = 'acknowledged'
+    FAILED = 'failed'
+
+
+@dataclass
+class JournalEntry:
+    key: str
+    payload: Payload
+    state: EntryState
+    error: Optional[str] = None
+
+
+class SubmissionJournal:
+    """Append-only log of MoneyBook submissions, keyed by payload form so each import path needs its own file"""
+
+    def __init__(self, path: str, sync_every: int = 32):
+        self.path = path
+        self.dead_letter_path = f'{path}.dead'
+        self.sync_every = sync_every
+
+        self.entries: Dict[str, JournalEntry] = {}
+        self._occurrences: Dict[str, int] = {}
+        self._unsynced = 0
+
+        self._load()
+        self._truncate_torn_tail(self.dead_letter_path)
+        self._file = open(self.path, 'a')
+        self._dead_letter_file = open(self.dead_letter_path, 'a')
+
+    def __enter__(self) -> 'SubmissionJournal':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def submit(self, payload: Payload, send: Callable[[Payload], requests.Response]) -> bool:
+        """Send the payload unless an earlier run already got it acknowledged"""
+        key = self._key(payload)
+
+        entry = self.entries.get(key)
+        if entry is not None and entry.state == EntryState.ACKNOWLEDGED:
+            return True
+
+        return self._send(key, payload, send)
+
+    def pending(self) -> List[JournalEntry]:
+        return [entry for entry in self.entries.values() if entry.state != EntryState.ACKNOWLEDGED]
+
+    def failed(self) -> List[JournalEntry]:
+        return [entry for entry in self.entries.values() if entry.state == EntryState.FAILED]
+
+    def replay_dead_letters(self, send: Callable[[Payload], requests.Response]) -> int:
+        """Resend everything in the dead-letter segment that is still failed, return how many got through"""
+        replayed = 0
+
+        for key, payload in self._read_dead_letters().items():
+            entry = self.entries.get(key)
+            if entry is None or entry.state != EntryState.FAILED or payload is None:
+                continue
+
+            if self._send(key, payload, send):
+                replayed += 1
+
+        self._compact_dead_letters()
+        return replayed
+
+    def sync(self):
+        self._file.flush()
+        self._dead_letter_file.flush()
+        os.fsync(self._file.fileno())
+        os.fsync(self._dead_letter_file.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        self.sync()
+        self._file.close()
+        self._dead_letter_file.close()
+
+    def _send(self, key: str, payload: Payload, send: Callable[[Payload], requests.Response]) -> bool:
+        if payload is None:
+            self._record(key, EntryState.FAILED, payload, error='no request to send')
+            return False
+
+        self._record(key, EntryState.PENDING, payload)
+
+        try:
+            resp = send(payload)
+        except Exception as e:
+            self._record(key, EntryState.FAILED, payload, error=str(e))
+            return False
+
+        self._record(key, EntryState.SENT)
+
+        if not resp.ok:
+            self._record(key, EntryState.FAILED, payload, error=f'HTTP {resp.status_code}')
+            return False
+
+        self._record(key, EntryState.ACKNOWLEDGED)
+        return True
+
+    def _key(self, payload: Payload) -> str:
+        # the key hashes the payload as sent plus how many identical payloads came before it in the
+        # run, so a dict body and the same transfer pre-encoded as bytes never share a key
+        digest = hashlib.sha1(json.dumps(self._encode_payload(payload), sort_keys=True).encode()).hexdigest()
+
+        occurrence = self._occurrences.get(digest, 0)
+        self._occurrences[digest] = occurrence + 1
+
+        return f'{digest}#{occurrence}'
+
+    def _record(self, key: str, state: EntryState, payload: Payload = None, error: Optional[str] = None):
+        record = {'key': key, 'state': state.value}
+
+        entry = self.entries.get(key)
+        if entry is None or state == EntryState.PENDING:
+            # only the first record of an attempt carries the payload, later ones just move the state
+            record['payload'] = self._encode_payload(payload)
+            record['raw'] = isinstance(payload, bytes)
+
+        if error is not None:
+            record['error'] = error
+
+        self._write(self._file, record)
+
+        if entry is None:
+            entry = JournalEntry(key, payload, state)
+            self.entries[key] = entry
+        entry.state = state
+        entry.error = error
+
+        if state == EntryState.FAILED:
+            self._write(self._dead_letter_file, {
+                'key': key,
+                'payload': self._encode_payload(entry.payload),
+                'raw': isinstance(entry.payload, bytes),
+                'error': error,
+            })
+
+    def _write(self, file, record: Dict[str, Any]):
+        # flushing every record survives a crashed process, fsync is batched to stay cheap next to
+        # the HTTP round trip at the cost of the last few records on a power loss
+        file.write(json.dumps(record) + '\n')
+        file.flush()
+
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def _load(self):
+        records = self._truncate_torn_tail(self.path)
+
+        for record in records:
+            key = record['key']
+            state = EntryState(record['state'])
+
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = JournalEntry(key, self._decode_payload(record), state)
+                self.entries[key] = entry
+            elif 'payload' in record:
+                entry.payload = self._decode_payload(record)
+
+            entry.state = state
+            entry.error = record.get('error')
+
+    def _read_dead_letters(self) -> Dict[str, Payload]:
+        self._dead_letter_file.flush()
+        records, _ = self._read_records(self.dead_letter_path)
+        return {record['key']: self._decode_payload(record) for record in records}
+
+    def _compact_dead_letters(self):
+        self.sync()
+        self._dead_letter_file.close()
+
+        tmp_path = f'{self.dead_letter_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            for entry in self.failed():
+                f.write(json.dumps({
+                    'key': entry.key,
+                    'payload': self._encode_payload(entry.payload),
+                    'raw': isinstance(entry.payload, bytes),
+                    'error': entry.error,
+                }) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp_path, self.dead_letter_path)
+        self._dead_letter_file = open(self.dead_letter_path, 'a')
+
+    @staticmethod
+    def _read_records(path: str) -> Tuple[List[Dict[str, Any]], int]:
+        """Complete records of the file and the byte offset where they end"""
+        if not os.path.exists(path):
+            return [], 0
+
+        records = []
+        end = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                # a crash mid-write can leave the last line torn, everything before it is still valid
+                if not line.endswith(b'\n'):
+                    break
+
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+
+                end += len(line)
+
+        return records, end
+
+    @staticmethod
+    def _truncate_torn_tail(path: str) -> List[Dict[str, Any]]:
+        records, end = SubmissionJournal._read_records(path)
+
+        # cut a torn line off, otherwise the next append lands on it and later loads stop there
+        if os.path.exists(path) and os.path.getsize(path) > end:
+            with open(path, 'r+b') as f:
+                f.truncate(end)
+                os.fsync(f.fileno())
+
+        return records
+
+    @staticmethod
+    def _encode_payload(payload: Payload) -> Dict[str, Any] | str | None:
+        if isinstance(payload, bytes):
+            # pre-encoded form bodies are plain ascii
+            return payload.decode('ascii')
+
+        return payload
+
+    @staticmethod
+    def _decode_payload(record: Dict[str, Any]) -> Payload:
+        payload = record.get('payload')
+        if record.get('raw') and payload is not None:
+            return payload.encode('ascii')
+
+        return payload
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    class Response:
+        ok = True
+
+    sent = []
+
+    def send(payload):
+        sent.append(payload)
+        return Response()
+
+    payloads = [{'moveMoney': 1.5}, b'moveMoney=2.0']
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'journal.jsonl')
+
+        with SubmissionJournal(path) as journal:
+            for payload in payloads:
+                journal.submit(payload, send)
+
+        # simulate a crash in the middle of writing a record
+        with open(path, 'a') as f:
+            f.write('{"key": "abc#0", "state": "pen')
+
+        for _ in range(3):
+            with SubmissionJournal(path) as journal:
+                for payload in payloads:
+                    journal.submit(payload, send)
+
+        assert sent == payloads, sent
+        print('resumed after torn write without re-sending')
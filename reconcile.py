@@ -0,0 +1,117 @@
+import datetime
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+from dbs import DBS, Transaction
+from simply_go import SimplyGo, Trip
+from transaction_store import as_datetime
+
+
+@dataclass
+class Match:
+    debit: Transaction
+    trips: List[Trip]
+
+
+@dataclass
+class Reconciliation:
+    matches: List[Match] = field(default_factory=list)
+    unmatched_debits: List[Transaction] = field(default_factory=list)
+    unmatched_trips: List[Trip] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "matched": len(self.matches),
+            "unmatched_debits": len(self.unmatched_debits),
+            "unmatched_trips": len(self.unmatched_trips),
+        }
+
+
+class TransitReconciler:
+    """Pair DBS `POS`/`BAT` card debits with the SimplyGo trips they paid for"""
+
+    @staticmethod
+    def is_transit_debit(transaction: Transaction) -> bool:
+        return transaction.statement_code == 'POS' and transaction.reference_code == 'BAT' and bool(transaction.debit)
+
+    @staticmethod
+    def reconcile(transactions: List[Transaction], trips: List[Trip], window_days: int = 3) -> Reconciliation:
+        window = datetime.timedelta(days=window_days)
+
+        debits = [(TransitReconciler._cents(transaction.debit), as_datetime(transaction.date).date(), transaction)
+                  for transaction in transactions if TransitReconciler.is_transit_debit(transaction)]
+
+        days: Dict[datetime.date, List[Trip]] = {}
+        for trip in trips:
+            days.setdefault(as_datetime(trip.date).date(), []).append(trip)
+
+        daily_totals = [(sum(TransitReconciler._cents(trip.fare) for trip in day_trips), date, day_trips)
+                        for date, day_trips in days.items()]
+
+        # a debit usually covers a whole day of travel, charged on the day or a few days later, so
+        # match daily totals first and only then single trips of the days left over
+        result = Reconciliation()
+
+        matched, debits, daily_totals = TransitReconciler._sweep(debits, daily_totals, window)
+        result.matches += [Match(debit, day_trips) for debit, day_trips in matched]
+
+        single_trips = [(TransitReconciler._cents(trip.fare), date, trip)
+                        for _, date, day_trips in daily_totals for trip in day_trips]
+
+        matched, debits, single_trips = TransitReconciler._sweep(debits, single_trips, window)
+        result.matches += [Match(debit, [trip]) for debit, trip in matched]
+
+        result.matches.sort(key=lambda match: as_datetime(match.debit.date))
+        result.unmatched_debits = [debit for _, _, debit in sorted(debits, key=lambda item: item[1])]
+        result.unmatched_trips = [trip for _, _, trip in sorted(single_trips, key=lambda item: item[1])]
+
+        return result
+
+    @staticmethod
+    def _sweep(debits: List[Tuple[int, datetime.date, Any]], candidates: List[Tuple[int, datetime.date, Any]],
+               window: datetime.timedelta) -> Tuple[List[Tuple[Any, Any]], List[Tuple], List[Tuple]]:
+        """Match both sides ordered by (amount, date) in one forward pass"""
+        debits = sorted(debits, key=lambda item: item[:2])
+        candidates = sorted(candidates, key=lambda item: item[:2])
+
+        matched = []
+        unmatched_debits = []
+        unmatched_candidates = []
+
+        # within one amount, a candidate older than the window can't match any later debit and a
+        # debit older than the next candidate can't be matched, so each side only moves forward
+        i = j = 0
+        while i < len(debits) and j < len(candidates):
+            debit_cents, debit_date, debit = debits[i]
+            candidate_cents, candidate_date, candidate = candidates[j]
+
+            if candidate_cents < debit_cents or (candidate_cents == debit_cents and candidate_date < debit_date - window):
+                unmatched_candidates.append(candidates[j])
+                j += 1
+            elif candidate_cents > debit_cents or candidate_date > debit_date:
+                unmatched_debits.append(debits[i])
+                i += 1
+            else:
+                matched.append((debit, candidate))
+                i += 1
+                j += 1
+
+        unmatched_debits += debits[i:]
+        unmatched_candidates += candidates[j:]
+
+        return matched, unmatched_debits, unmatched_candidates
+
+    @staticmethod
+    def _cents(amount: float | str) -> int:
+        return round(float(amount) * 100)
+
+
+if __name__ == '__main__':
+    dbs_df = DBS.parse_transaction_history_csv('/home/ajohanes/Downloads/b8fd0fffea50be10f53ff12d06f4026d.P000000077958701.csv')
+    transactions = dbs_df.apply(lambda row: Transaction(*row), axis=1).to_list()
+    trips = SimplyGo.parse_pdf('/home/ajohanes/Downloads/TL-SimplyGo-TransactionHistory-20-Oct-24-22-00-07.pdf')
+
+    reconciliation = TransitReconciler.reconcile(transactions, trips)
+    print(reconciliation.to_dict())
+    print(*reconciliation.unmatched_debits, sep='\n')
+    print(*reconciliation.unmatched_trips, sep='\n')
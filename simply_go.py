@@ -1,8 +1,12 @@
+from array import array
 import datetime
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 from dataclasses import dataclass
+from itertools import repeat
+import math
 import re
-from typing import List, Tuple
+from typing import Iterator, List, Tuple
 import PyPDF2
 import pytesseract
 from PIL import Image
@@ -11,6 +15,8 @@ from datetime import datetime
 
 from dto import *
 from finance_manager import *
+from journal import SubmissionJournal
+from transaction_store import TransactionStore, as_datetime
 
 
 class TransportType(Enum):
@@ -49,7 +55,7 @@ class Trip:
         return f'Trip(date={self.date}, start_time={self.start_time}, end_time={self.end_time}, from={self.from_destination}, to={self.to_destination}, fare={self.fare}, transport={self.get_transport_type()}, transactions=\n\t{transaction_lines})'
 
     def get_transport_type(self) -> 'TransportType':
-        if self.transport:
+        if self.transport != TransportType.UNKNOWN:
             return self.transport
 
         transportTypes = {
@@ -57,7 +63,7 @@ class Trip:
 
         match len(transportTypes):
             case 0:
-                return None
+                return TransportType.UNKNOWN
             case 1:
                 return transportTypes.pop()
             case _:
@@ -112,6 +118,140 @@ class Trip:
         return request
 
 
+class TripTable:
+    """Columnar store of trips that hands out `Trip` views on access"""
+
+    def __init__(self):
+        # station names are stored once and referenced by id
+        self.stations: List[str] = []
+        self._station_ids: Dict[str, int] = {}
+
+        # dates are ordinals and times seconds of the day, with 0 and -1 standing in for a missing value
+        self.dates = array('l')
+        self.start_times = array('l')
+        self.end_times = array('l')
+        self.from_ids = array('l')
+        self.to_ids = array('l')
+        self.fares = array('d')
+        self.transports = array('b')
+        self.leg_offsets = array('l', [0])
+
+        # legs of all trips share these columns, leg_offsets[i]:leg_offsets[i + 1] are the legs of trip i
+        self.leg_times = array('l')
+        self.leg_from_ids = array('l')
+        self.leg_to_ids = array('l')
+        self.leg_fares = array('d')
+        self.leg_transports = array('b')
+
+    @staticmethod
+    def from_trips(trips: List['Trip']) -> 'TripTable':
+        table = TripTable()
+        for trip in trips:
+            table.append(trip)
+
+        return table
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __getitem__(self, index: int) -> 'Trip':
+        index = self._index(index)
+        return Trip(
+            date=self._date(self.dates[index]),
+            from_destination=self.stations[self.from_ids[index]],
+            to_destination=self.stations[self.to_ids[index]],
+            fare=self.fares[index],
+            transactions=self.legs(index),
+            start_time=self._time(self.start_times[index]),
+            end_time=self._time(self.end_times[index]),
+            transport=TransportType(self.transports[index]),
+        )
+
+    def __iter__(self) -> Iterator['Trip']:
+        for index in range(len(self)):
+            yield self[index]
+
+    def append(self, trip: 'Trip'):
+        self.dates.append(trip.date.toordinal() if trip.date else 0)
+        self.start_times.append(self._seconds(trip.start_time))
+        self.end_times.append(self._seconds(trip.end_time))
+        self.from_ids.append(self._intern(trip.from_destination))
+        self.to_ids.append(self._intern(trip.to_destination))
+        self.fares.append(float(trip.fare))
+        self.transports.append(trip.get_transport_type().value)
+
+        for transaction in trip.transactions:
+            self.leg_times.append(self._seconds(transaction.time))
+            self.leg_from_ids.append(self._intern(transaction.from_destination))
+            self.leg_to_ids.append(self._intern(transaction.to_destination))
+            self.leg_fares.append(float(transaction.fare))
+            self.leg_transports.append(transaction.transport.value)
+
+        self.leg_offsets.append(len(self.leg_times))
+
+    def legs(self, index: int) -> List['Transaction']:
+        index = self._index(index)
+        return [
+            Transaction(
+                time=self._time(self.leg_times[leg]),
+                from_destination=self.stations[self.leg_from_ids[leg]],
+                to_destination=self.stations[self.leg_to_ids[leg]],
+                fare=self.leg_fares[leg],
+                transport=TransportType(self.leg_transports[leg]),
+            )
+            for leg in range(self.leg_offsets[index], self.leg_offsets[index + 1])
+        ]
+
+    def rows(self) -> Iterator[Tuple[datetime.date | None, str, str, float, 'TransportType']]:
+        """(date, from, to, fare, transport) per trip, without building the Trip and its legs"""
+        for ordinal, from_id, to_id, fare, transport in zip(self.dates, self.from_ids, self.to_ids,
+                                                            self.fares, self.transports):
+            yield self._date(ordinal), self.stations[from_id], self.stations[to_id], fare, TransportType(transport)
+
+    def _index(self, index: int) -> int:
+        if not isinstance(index, int):
+            raise TypeError(f'TripTable indices must be integers, not {type(index).__name__}')
+
+        # negative indexes have to be resolved before they are used to look up leg_offsets
+        if index < 0:
+            index += len(self)
+
+        if not 0 <= index < len(self):
+            raise IndexError('TripTable index out of range')
+
+        return index
+
+    def _intern(self, station: str) -> int:
+        station_id = self._station_ids.get(station)
+        if station_id is None:
+            station_id = len(self.stations)
+            self.stations.append(station)
+            self._station_ids[station] = station_id
+
+        return station_id
+
+    @staticmethod
+    def _seconds(time: datetime.time | None) -> int:
+        if time is None:
+            return -1
+
+        return time.hour * 3600 + time.minute * 60 + time.second
+
+    @staticmethod
+    def _time(seconds: int) -> datetime.time | None:
+        if seconds < 0:
+            return None
+
+        return datetime.time(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+    @staticmethod
+    def _date(ordinal: int) -> datetime.date | None:
+        if ordinal == 0:
+            return None
+
+        return datetime.date.fromordinal(ordinal)
+
+
 def parse_date(date_str: str) -> datetime.date | None:
     """Extract date from text in format 'DD-MMM-YYYY'"""
     try:
@@ -133,14 +273,40 @@ def parse_time(time_str):
     return None  # Return None if all formats fail
 
 
+def extract_page_range(path: str, start: int, stop: int) -> List[Tuple[List[str], bool]]:
+    """Extract the lines of pages [start, stop) and whether each page has trip lines, run inside a worker process"""
+    with open(path, 'rb') as f:
+        pdf_reader = PyPDF2.PdfReader(f)
+
+        result = []
+
+        for index in range(start, stop):
+            text_list = pdf_reader.pages[index].extract_text(space_width=1.0).splitlines()
+            # empty and POSTED lines are ignored by parse_trip_data anyway, no need to send them back
+            text_list = [line.strip() for line in text_list]
+            text_list = [line for line in text_list if line and not line.startswith('POSTED')]
+
+            result.append((text_list, any(SimplyGo.is_trip_line(line) for line in text_list)))
+
+        return result
+
+
 class SimplyGo:
     @staticmethod
-    def parse_pdf(path: str) -> List['Trip']:
-        pdf_text = SimplyGo.extract_pdf(path)
+    def parse_pdf(path: str, workers: int | None = None) -> List['Trip']:
+        pdf_text = SimplyGo.extract_pdf(path, workers)
         # print(*pdf_text,sep='\n')
         return SimplyGo.parse_trip_data(pdf_text)
 
-    def extract_pdf(path: str) -> List[str]:
+    @staticmethod
+    def parse_pdf_table(path: str, workers: int | None = None) -> 'TripTable':
+        return TripTable.from_trips(SimplyGo.parse_pdf(path, workers))
+
+    @staticmethod
+    def extract_pdf(path: str, workers: int | None = None) -> List[str]:
+        if workers is not None and workers > 1:
+            return SimplyGo.extract_pdf_parallel(path, workers)
+
         with open(path, 'rb') as f:
             pdf_reader = PyPDF2.PdfReader(f)
 
@@ -155,6 +321,82 @@ class SimplyGo:
 
             return result
 
+    @staticmethod
+    def extract_pdf_parallel(path: str, workers: int) -> List[str]:
+        with open(path, 'rb') as f:
+            page_count = len(PyPDF2.PdfReader(f).pages)
+
+        # a few shards per worker so a slow page range doesn't hold up the rest
+        shard_size = max(1, math.ceil(page_count / (workers * 4)))
+        starts = range(0, page_count, shard_size)
+        stops = [min(start + shard_size, page_count) for start in starts]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            shards = executor.map(extract_page_range, repeat(path), starts, stops)
+
+            # map keeps the page order, so a trip continuing on the next page is stitched back together
+            result = []
+            need_trip_detail = need_transaction_detail = False
+
+            for shard in shards:
+                for text_list, has_trip_line in shard:
+                    # a page without trip lines is only skipped when no trip or transaction is waiting
+                    # for its detail, otherwise parse_trip_data would have consumed its lines
+                    if not has_trip_line and not need_trip_detail and not need_transaction_detail:
+                        continue
+
+                    need_trip_detail, need_transaction_detail = SimplyGo.detail_state(
+                        text_list, need_trip_detail, need_transaction_detail)
+                    result += text_list
+
+            return result
+
+    @staticmethod
+    def detail_state(data: List[str], need_trip_detail: bool, need_transaction_detail: bool) -> Tuple[bool, bool]:
+        """Follow the need_* flags of parse_trip_data across the given lines"""
+        for line in data:
+            trip_start_match = SimplyGo.trip_start_regex.match(line)
+            if trip_start_match is not None:
+                need_trip_detail = not trip_start_match.group(7)
+                continue
+
+            if line.startswith("[Posting"):
+                need_trip_detail = False
+                continue
+
+            if need_trip_detail:
+                if SimplyGo.fare_regex.match(line) is not None:
+                    need_trip_detail = False
+                continue
+
+            transaction_start_match = SimplyGo.tansaction_start_regex.match(line)
+            if transaction_start_match is not None:
+                need_transaction_detail = not transaction_start_match.group(6)
+                continue
+
+            if need_transaction_detail:
+                # parse_trip_data either finds the fare here or raises
+                need_transaction_detail = False
+
+        return need_trip_detail, need_transaction_detail
+
+    @staticmethod
+    def is_trip_line(line: str) -> bool:
+        return (line.startswith('[Posting')
+                or SimplyGo.trip_start_regex.match(line) is not None
+                or SimplyGo.tansaction_start_regex.match(line) is not None
+                or SimplyGo.fare_regex.match(line) is not None)
+
+    @staticmethod
+    def to_store(trips: List['Trip']) -> TransactionStore['Trip']:
+        return TransactionStore(
+            trips,
+            timestamp=lambda trip: as_datetime(trip.date, trip.start_time or trip.end_time),
+            places=lambda trip: (trip.from_destination, trip.to_destination,
+                                 *(destination for transaction in trip.transactions
+                                   for destination in (transaction.from_destination, transaction.to_destination))),
+        )
+
     trip_start_regex = re.compile(
         "^(\\w{3}, \\d{2}/\\d{2}/\\d{4})(\\s?)(.*) - (((.*) \\$(\\d+\\.\\d+))|(.*))$")
     fare_regex = re.compile("^(.*)\\$([0-9.]+)$")
@@ -181,6 +423,7 @@ class SimplyGo:
             trip_start_match = SimplyGo.trip_start_regex.findall(trimmed_line)
             if len(trip_start_match) > 0:
                 if curr_trip is not None:
+                    curr_trip.transport = curr_trip.get_transport_type()
                     trips.append(curr_trip)
 
                 value = trip_start_match[0]
@@ -235,7 +478,7 @@ class SimplyGo:
                         value[0], SimplyGo.time_format_pattern).time(),
                     from_destination=value[1],
                     to_destination=to_destination,
-                    fare=fare if not need_transaction_detail else 0,
+                    fare=float(fare) if not need_transaction_detail else 0,
                     transport=TransportType.BUS if match else TransportType.MRT
                 )
 
@@ -264,7 +507,10 @@ class SimplyGo:
 
                 continue
 
-        trips.append(curr_trip)
+        if curr_trip is not None:
+            curr_trip.transport = curr_trip.get_transport_type()
+            trips.append(curr_trip)
+
         return trips
 
     @staticmethod
@@ -445,11 +691,9 @@ if __name__ == '__main__':
     m.load_asset_data()
     m.load_init_data()
 
-    assets = m.asset_groups
-    categories = {
-        InOutCode.Expenses: m.expense_categories,
-        InOutCode.Income: m.income_categories,
-    }
+    catalog = m.catalog
+    assets = catalog.asset_groups
+    categories = catalog.categories
 
     # trips = SimplyGo.parse_pdf('/home/ajohanes/Downloads/TL-SimplyGo-TransactionHistory-20-Oct-24-22-00-07.pdf')
     # trips = SimplyGo.parse_transit_from_image_path(
@@ -458,12 +702,14 @@ if __name__ == '__main__':
         './transport.csv')
     # print(*trips, sep='\n')
 
-    for trip in trips[::-1]:
-        # print(trip)
+    with SubmissionJournal('./simply_go_journal.jsonl') as journal:
+        for trip in trips[::-1]:
+            # print(trip)
 
-        request = trip.to_request(assets, categories)
-        print(request.to_dict())
+            request = trip.to_request(assets, categories)
+            payload = request.to_dict() if request is not None else None
+            print(payload)
 
-        # m.create_in_out_transaction(request)
+            # journal.submit(payload, m.post_in_out_transaction)
 
     print('done')
@@ -0,0 +1,104 @@
+import bisect
+import datetime
+from typing import Callable, Dict, Generic, Iterable, List, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+def as_datetime(value: datetime.date, time: datetime.time | None = None) -> datetime.datetime:
+    if isinstance(value, datetime.datetime):
+        return value
+
+    return datetime.datetime.combine(value, time or datetime.time.min)
+
+
+class TransactionStore(Generic[T]):
+    """Read-only view of parsed records sorted by timestamp, with place and text indexes"""
+
+    def __init__(self, records: Iterable[T],
+                 timestamp: Callable[[T], datetime.datetime],
+                 places: Callable[[T], Iterable[str]] = lambda record: (),
+                 texts: Callable[[T], Iterable[str]] = lambda record: ()):
+        keyed = sorted(((timestamp(record), record) for record in records), key=lambda item: item[0])
+
+        # timestamps run parallel to records, so a date range is two bisects and a slice
+        self.timestamps: List[datetime.datetime] = [key for key, _ in keyed]
+        self.records: List[T] = [record for _, record in keyed]
+
+        # each index maps a lowercased key to the time-ordered positions of its records
+        self._places = self._build_index(places)
+        self._texts = self._build_index(texts)
+        self._sorted_places = sorted(self._places)
+        self._sorted_texts = sorted(self._texts)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def between(self, start: datetime.date, end: datetime.date) -> List[T]:
+        """All records with start <= timestamp < end"""
+        lo, hi = self._bounds(start, end)
+        return self.records[lo:hi]
+
+    def on(self, date: datetime.date) -> List[T]:
+        return self.between(date, date + datetime.timedelta(days=1))
+
+    def by_place(self, place: str, start: datetime.date | None = None, end: datetime.date | None = None) -> List[T]:
+        return self._lookup(self._places, [place.strip().lower()], start, end)
+
+    def by_place_prefix(self, prefix: str, start: datetime.date | None = None,
+                        end: datetime.date | None = None) -> List[T]:
+        return self._lookup(self._places, self._prefix_keys(self._sorted_places, prefix), start, end)
+
+    def by_text(self, text: str, start: datetime.date | None = None, end: datetime.date | None = None) -> List[T]:
+        return self._lookup(self._texts, [text.strip().lower()], start, end)
+
+    def by_text_prefix(self, prefix: str, start: datetime.date | None = None,
+                       end: datetime.date | None = None) -> List[T]:
+        return self._lookup(self._texts, self._prefix_keys(self._sorted_texts, prefix), start, end)
+
+    def _build_index(self, keys: Callable[[T], Iterable[str]]) -> Dict[str, List[int]]:
+        index: Dict[str, List[int]] = {}
+
+        for position, record in enumerate(self.records):
+            for key in keys(record):
+                if not key:
+                    continue
+
+                positions = index.setdefault(key.strip().lower(), [])
+                if not positions or positions[-1] != position:
+                    positions.append(position)
+
+        return index
+
+    def _bounds(self, start: datetime.date | None, end: datetime.date | None) -> Tuple[int, int]:
+        lo = 0 if start is None else bisect.bisect_left(self.timestamps, as_datetime(start))
+        hi = len(self.timestamps) if end is None else bisect.bisect_left(self.timestamps, as_datetime(end))
+        return lo, hi
+
+    def _lookup(self, index: Dict[str, List[int]], keys: List[str],
+                start: datetime.date | None, end: datetime.date | None) -> List[T]:
+        lo, hi = self._bounds(start, end)
+
+        # narrow every key to the date range before merging, so a wide prefix stays cheap
+        matched = []
+        for key in keys:
+            positions = index.get(key, [])
+            matched.append(positions[bisect.bisect_left(positions, lo):bisect.bisect_left(positions, hi)])
+
+        if len(matched) == 1:
+            positions = matched[0]
+        else:
+            positions = sorted({position for narrowed in matched for position in narrowed})
+
+        return [self.records[position] for position in positions]
+
+    @staticmethod
+    def _prefix_keys(sorted_keys: List[str], prefix: str) -> List[str]:
+        prefix = prefix.strip().lower()
+        first = bisect.bisect_left(sorted_keys, prefix)
+        # every key starting with the prefix sorts before prefix + the highest code point
+        last = bisect.bisect_left(sorted_keys, prefix + '\U0010ffff')
+        return sorted_keys[first:last]